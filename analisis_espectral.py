@@ -0,0 +1,164 @@
+import numpy as np
+
+# Muestras por bloque al acumular la correlación cruzada; acota la memoria usada
+TAMANO_BLOQUE = 1 << 14
+
+
+def _siguiente_potencia_2(n):
+    return 1 << max(int(n) - 1, 0).bit_length()
+
+
+# Centra la serie con la media de los valores válidos y pone a cero los faltantes
+def _centrar(valores, validos):
+    valores = np.asarray(valores, dtype=float)
+    validos = np.asarray(validos, dtype=bool) & np.isfinite(valores)
+    if not validos.any():
+        return np.zeros(len(valores)), validos, 0.0
+    media = valores[validos].mean()
+    centrada = np.where(validos, valores - media, 0.0)
+    desviacion = np.sqrt((centrada ** 2).sum() / validos.sum())
+    return centrada, validos, desviacion
+
+
+# Función para la correlación cruzada con desfase en O(n log n)
+def correlacion_cruzada(x, y, validos, max_desfase, tamano_bloque=TAMANO_BLOQUE):
+    """Correlación de Pearson entre `x[t]` e `y[t + k]` para k en [-max_desfase, max_desfase].
+
+    Un pico en k > 0 indica que `y` responde `k` muestras después de `x`. Las
+    posiciones no válidas se excluyen: cada desfase se normaliza con el número
+    de pares válidos que realmente se solapan. La serie se procesa por bloques
+    de `tamano_bloque` muestras, así que la memoria no crece con la longitud.
+    """
+    x, vx, sx = _centrar(x, validos)
+    y, vy, sy = _centrar(y, validos)
+    n = len(x)
+    m = int(max_desfase)
+    desfases = np.arange(-m, m + 1)
+
+    suma = np.zeros(2 * m + 1)
+    pares = np.zeros(2 * m + 1)
+    nfft = _siguiente_potencia_2(2 * tamano_bloque + 2 * m)
+
+    for inicio in range(0, n, tamano_bloque):
+        fin = min(inicio + tamano_bloque, n)
+
+        # Tramo de y desplazado en -m para cubrir los desfases negativos
+        desde, hasta = inicio - m, fin + m
+        pad_izq, pad_der = max(-desde, 0), max(hasta - n, 0)
+        tramo_y = np.pad(y[max(desde, 0):min(hasta, n)], (pad_izq, pad_der))
+        tramo_vy = np.pad(vy[max(desde, 0):min(hasta, n)], (pad_izq, pad_der)).astype(float)
+
+        fx = np.conj(np.fft.rfft(x[inicio:fin], nfft))
+        fvx = np.conj(np.fft.rfft(vx[inicio:fin].astype(float), nfft))
+        suma += np.fft.irfft(fx * np.fft.rfft(tramo_y, nfft), nfft)[:2 * m + 1]
+        pares += np.fft.irfft(fvx * np.fft.rfft(tramo_vy, nfft), nfft)[:2 * m + 1]
+
+    pares = np.rint(pares)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlacion = np.where(pares > 1, suma / (pares * sx * sy), np.nan)
+    return desfases, correlacion
+
+
+# Función para la densidad espectral de potencia por el método de Welch
+def espectro_welch(valores, validos, periodo_s, nperseg=256, solape=0.5, min_validos=0.9):
+    """Promedia periodogramas de segmentos con ventana de Hann.
+
+    Se descartan los segmentos con menos de `min_validos` de muestras válidas;
+    a los restantes se les quita la tendencia lineal (ajustada sobre las
+    muestras válidas) y los faltantes se rellenan con cero.
+    Devuelve (frecuencias en Hz, densidad, segmentos usados).
+    """
+    valores = np.asarray(valores, dtype=float)
+    validos = np.asarray(validos, dtype=bool) & np.isfinite(valores)
+    fs = 1.0 / periodo_s
+    paso = max(int(nperseg * (1 - solape)), 1)
+    ventana = np.hanning(nperseg)
+    posiciones = np.arange(nperseg)
+    escala = 1.0 / (fs * (ventana ** 2).sum())
+
+    frecuencias = np.fft.rfftfreq(nperseg, d=periodo_s)
+    acumulado = np.zeros(len(frecuencias))
+    usados = 0
+
+    for inicio in range(0, len(valores) - nperseg + 1, paso):
+        v = validos[inicio:inicio + nperseg]
+        if v.mean() < min_validos:
+            continue
+        segmento = valores[inicio:inicio + nperseg]
+        # Sin la tendencia, una deriva dentro del segmento no domina las frecuencias bajas
+        pendiente, ordenada = np.polyfit(posiciones[v], segmento[v], 1)
+        segmento = np.where(v, segmento - (pendiente * posiciones + ordenada), 0.0)
+        acumulado += np.abs(np.fft.rfft(segmento * ventana)) ** 2
+        usados += 1
+
+    if usados == 0:
+        return frecuencias, np.full(len(frecuencias), np.nan), 0
+
+    densidad = acumulado * escala / usados
+    # Espectro de un solo lado: se duplica todo salvo DC y Nyquist
+    densidad[1:-1 if nperseg % 2 == 0 else None] *= 2
+    return frecuencias, densidad, usados
+
+
+# Primer índice considerado al buscar la frecuencia dominante: con la ventana de
+# Hann (lóbulo principal de ±2 índices), lo que queda de la tendencia cae en los índices 1 y 2
+_PRIMER_INDICE_PICO = 3
+
+
+# Frecuencia del máximo local con mayor potencia, ignorando las frecuencias más bajas
+def frecuencia_dominante(frecuencias, densidad):
+    """Devuelve NaN si el espectro no tiene ningún pico por encima de sus vecinos."""
+    densidad = np.asarray(densidad, dtype=float)
+    k = np.arange(_PRIMER_INDICE_PICO, len(densidad) - 1)
+    picos = k[(densidad[k] > densidad[k - 1]) & (densidad[k] >= densidad[k + 1])]
+    if len(picos) == 0:
+        return np.nan
+    return frecuencias[picos[np.argmax(densidad[picos])]]
+
+
+# Máscara de posiciones válidas de un tramo de la rejilla, opcionalmente por estado
+def _validos_tramo(rejilla, i0, i1, mascara=None):
+    validos = np.asarray(rejilla.valido[i0:i1])
+    return validos if mascara is None else validos & mascara
+
+
+# Correlación presión → temperatura sobre un tramo de la rejilla, con su pico
+def analizar_desfase(rejilla, i0, i1, mascara, max_desfase):
+    desfases, correlacion = correlacion_cruzada(
+        rejilla.presion[i0:i1],
+        rejilla.temperatura[i0:i1],
+        _validos_tramo(rejilla, i0, i1, mascara),
+        max_desfase
+    )
+    resultado = {
+        'desfases_s': desfases * rejilla.periodo_s,
+        'correlacion': correlacion,
+        'pico_s': None,
+        'pico': np.nan,
+    }
+    if np.isfinite(correlacion).any():
+        idx_pico = np.nanargmax(np.abs(correlacion))
+        resultado['pico_s'] = int(resultado['desfases_s'][idx_pico])
+        resultado['pico'] = correlacion[idx_pico]
+    return resultado
+
+
+# Espectros de Welch de temperatura y presión sobre un tramo de la rejilla
+def analizar_espectros(rejilla, i0, i1, mascara, nperseg):
+    validos = _validos_tramo(rejilla, i0, i1, mascara)
+    espectros = []
+    for variable in ('temperatura', 'presion'):
+        frecuencias, densidad, segmentos = espectro_welch(
+            getattr(rejilla, variable)[i0:i1],
+            validos,
+            rejilla.periodo_s,
+            nperseg=nperseg
+        )
+        espectros.append({
+            'variable': variable,
+            'frecuencias': frecuencias,
+            'densidad': densidad,
+            'segmentos': segmentos,
+            'dominante': frecuencia_dominante(frecuencias, densidad),
+        })
+    return espectros
@@ -1,10 +1,18 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
+from rejilla_temporal import obtener_rejilla, detectar_huecos, PERIODO_MUESTREO_S
+from analisis_espectral import analizar_desfase, analizar_espectros
+from planificador import PlanificadorCalculos, crear_pool
+from cache_figuras import CacheFiguras
+from huella import RegistroHuellas, huella_fuente, hash_completo
+from figuras import (
+    figura_dispersion_ols, figura_violin, figura_3d, figura_mapa_calor,
+    figura_estados, figura_serie_por_estado, figura_combinada, figura_histograma,
+    figura_box, figura_matriz_correlacion, figura_desfase, figura_espectro,
+    figura_burbujas, figura_franjas, figura_ejes_duales, ESTILO_VARIABLES
+)
 
 # Configuración de la página
 st.set_page_config(
@@ -17,13 +25,24 @@ st.set_page_config(
 st.title("📊 Análisis de Datos del Compresor")
 st.markdown("---")
 
+# Datasets cargados que se mantienen en memoria; cada uno puede ocupar cientos de MB
+MAX_DATASETS_CARGADOS = 3
+
 # Función para cargar y procesar el archivo
-@st.cache_data
-def cargar_datos(archivo):
+# La clave de cache se calcula a partir del contenido; el archivo (prefijo _) no se hashea.
+# Devuelve también el hash completo de lo que se leyó, para compararlo con la verificación
+@st.cache_data(max_entries=MAX_DATASETS_CARGADOS)
+def cargar_datos(clave, _archivo):
     try:
+        completo = hash_completo(_archivo if isinstance(_archivo, str) else _archivo.getbuffer())
+        
+        # Un archivo subido puede haber sido leído antes, volver al inicio
+        if hasattr(_archivo, 'seek'):
+            _archivo.seek(0)
+        
         # Leer el CSV con separador punto y coma y decimal coma
         df = pd.read_csv(
-            archivo, 
+            _archivo, 
             sep=';',
             decimal=',',
             encoding='latin-1'
@@ -38,10 +57,77 @@ def cargar_datos(archivo):
         # Convertir estado a string para mejor visualización
         df['estado_compresor'] = df['estado_compresor'].astype(str)
         
-        return df
+        return df, completo
     except Exception as e:
         st.error(f"Error al cargar el archivo: {str(e)}")
+        return None, None
+
+# Pool de hilos compartido por todas las sesiones para los cálculos pesados
+@st.cache_resource
+def obtener_pool():
+    return crear_pool()
+
+# Cache de figuras serializadas, compartida por todas las sesiones
+@st.cache_resource
+def obtener_cache_figuras():
+    return CacheFiguras()
+
+cache_figuras = obtener_cache_figuras()
+
+# Clave de una figura: huella del dataset, filtros que la afectan e identificador del gráfico
+def clave_figura(id_grafico, *parametros):
+    return (clave_datos, estado_seleccionado, fecha_inicio, fecha_fin, id_grafico) + parametros
+
+# Muestra la figura desde la cache; solo se construye si no estaba guardada
+def mostrar_figura_cache(clave, constructor, *args):
+    st.plotly_chart(cache_figuras.obtener_o_crear(clave, constructor, *args), width='stretch')
+
+# Hashes completos calculados en segundo plano para reforzar la clave de cache
+@st.cache_resource
+def obtener_registro_huellas():
+    return RegistroHuellas(obtener_pool())
+
+registro_huellas = obtener_registro_huellas()
+
+# Cada sesión tiene su planificador, para que cambiar filtros solo cancele sus propias tareas
+if 'planificador' not in st.session_state:
+    st.session_state['planificador'] = PlanificadorCalculos(obtener_pool())
+planificador = st.session_state['planificador']
+
+# Tareas en curso; al final del script se vigilan sin bloquear (ver `vigilar_tareas`)
+tareas_pendientes = []
+
+# Devuelve el resultado si la tarea terminó; si no, muestra un marcador y la anota como pendiente
+def resultado_tarea(futuro, mensaje="⏳ Calculando gráfico..."):
+    if futuro is not None and futuro.done() and not futuro.cancelled():
+        if futuro.exception() is None:
+            return futuro.result()
+        st.error(f"Error en el cálculo: {futuro.exception()}")
         return None
+    st.info(mensaje)
+    if futuro is not None and not futuro.done():
+        tareas_pendientes.append(futuro)
+    return None
+
+# Muestra la figura de una tarea del planificador si ya está lista
+def mostrar_figura(nombre):
+    figura = resultado_tarea(planificador.tarea(nombre))
+    if figura is not None:
+        st.plotly_chart(figura, width='stretch')
+
+# La rejilla de cada dataset se construye una vez por sesión, fuera de las generaciones
+# del planificador, para que cambiar filtros no la cancele ni la reconstruya
+def tarea_rejilla(clave, df):
+    anterior = st.session_state.get('tarea_rejilla')
+    if anterior is None or anterior[0] != clave:
+        st.session_state['tarea_rejilla'] = (clave, obtener_pool().submit(obtener_rejilla, df, clave))
+    return st.session_state['tarea_rejilla'][1]
+
+# Se ejecuta en el pool: espera la rejilla, aplica los filtros y guarda el resultado en la cache
+def calcular_sobre_rejilla(futuro_rejilla, seleccion, clave, funcion, *args):
+    rejilla = futuro_rejilla.result()
+    i0, i1, mascara = rejilla.seleccion(*seleccion)
+    return cache_figuras.obtener_o_crear(clave, funcion, rejilla, i0, i1, mascara, *args)
 
 # Sidebar para cargar archivo
 with st.sidebar:
@@ -52,13 +138,48 @@ with st.sidebar:
     
     if usar_archivo_default:
         archivo = "datos2.csv"
-        df = cargar_datos(archivo)
     else:
-        archivo_subido = st.file_uploader("Cargar archivo CSV", type=['csv'])
-        if archivo_subido is not None:
-            df = cargar_datos(archivo_subido)
-        else:
-            df = None
+        archivo = st.file_uploader("Cargar archivo CSV", type=['csv'])
+    
+    # Clave de cache: huella rápida (tamaño, fecha de modificación y bloques muestreados);
+    # un archivo subido añade su file_id. El hash completo solo entra en la clave si
+    # contradice al de los datos guardados con la huella rápida
+    df = None
+    clave_datos = None
+    if archivo is not None:
+        try:
+            huella = huella_fuente(archivo)
+        except OSError as e:
+            st.error(f"Error al cargar el archivo: {str(e)}")
+            huella = None
+        
+        verificar_huella = st.checkbox(
+            "Verificar con hash completo",
+            value=False,
+            help="Calcula en segundo plano el hash de todo el archivo y lo compara con el de los datos cargados"
+        )
+        
+        if huella is not None:
+            identidad = archivo if isinstance(archivo, str) else archivo.file_id
+            clave_datos = huella if isinstance(archivo, str) else f"{huella}-{archivo.file_id}"
+            df, hash_datos = cargar_datos(clave_datos, archivo)
+            
+            if df is not None and verificar_huella:
+                fuente = archivo if isinstance(archivo, str) else archivo.getbuffer()
+                futuro_hash = registro_huellas.verificar(identidad, huella, fuente)
+                completo = registro_huellas.completo(identidad, huella)
+                if completo is not None:
+                    if completo != hash_datos:
+                        # Colisión: lo guardado con la huella rápida es de otro contenido
+                        clave_datos = f"{huella}-{completo}"
+                        df, hash_datos = cargar_datos(clave_datos, archivo)
+                        st.warning("⚠️ El contenido no coincide con la huella rápida; se recargaron los datos")
+                    st.caption(f"🔒 Hash completo: `{completo}`")
+                elif futuro_hash.done():
+                    st.caption(f"⚠️ No se pudo calcular el hash completo: {futuro_hash.exception()}")
+                else:
+                    st.caption("⏳ Calculando hash completo...")
+                    tareas_pendientes.append(futuro_hash)
     
     if df is not None:
         st.success(f"✅ Archivo cargado: {len(df):,} registros")
@@ -91,6 +212,41 @@ if df is not None:
         (df_filtrado['fecha_hora'].dt.date <= fecha_fin)
     ]
     
+    # Lanzar en segundo plano las figuras pesadas de las otras pestañas
+    planificador.actualizar((clave_datos, estado_seleccionado, fecha_inicio, fecha_fin))
+    # Las tareas devuelven la figura y la guardan en la cache de figuras
+    tareas_fondo = {
+        'violin_temp': (figura_violin, df_filtrado, 'temperatura', 'Violin Plot - Temperatura', 'Temperatura (°C)'),
+        'violin_presion': (figura_violin, df_filtrado, 'presion', 'Violin Plot - Presión', 'Presión (bar)'),
+        'dispersion_ols': (figura_dispersion_ols, df_filtrado),
+        '3d': (figura_3d, df_filtrado),
+        'mapa_calor': (figura_mapa_calor, df_filtrado),
+    }
+    for nombre, (constructor, *argumentos) in tareas_fondo.items():
+        planificador.enviar(nombre, cache_figuras.obtener_o_crear, clave_figura(nombre), constructor, *argumentos)
+    
+    # Rejilla regular en segundo plano: el rango de fechas se resuelve con aritmética de índices
+    codigo_estado = None
+    if estado_seleccionado != 'Todos':
+        codigo_estado = pd.to_numeric(estado_seleccionado, errors='coerce')
+        codigo_estado = -1 if pd.isna(codigo_estado) else int(codigo_estado)
+    seleccion = (pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin) + timedelta(days=1), codigo_estado)
+    futuro_rejilla = tarea_rejilla(clave_datos, df)
+    
+    # Vista combinada y análisis de la pestaña 4, que dependen de la rejilla
+    max_desfase = int(st.session_state.get('max_desfase_min', 30) * 60 // PERIODO_MUESTREO_S)
+    nperseg = st.session_state.get('nperseg', 256)
+    # El nombre de cada análisis incluye su parámetro: cambiar el control lanza otra tarea
+    tarea_desfase = f'analisis_desfase_{max_desfase}'
+    tarea_espectro = f'analisis_espectro_{nperseg}'
+    tareas_rejilla = {
+        'combinada': (clave_figura('combinada'), figura_combinada),
+        tarea_desfase: (clave_figura('analisis_desfase', max_desfase), analizar_desfase, max_desfase),
+        tarea_espectro: (clave_figura('analisis_espectro', nperseg), analizar_espectros, nperseg),
+    }
+    for nombre, (clave, funcion, *argumentos) in tareas_rejilla.items():
+        planificador.enviar(nombre, calcular_sobre_rejilla, futuro_rejilla, seleccion, clave, funcion, *argumentos)
+    
     # Tabs para organizar el contenido
     tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "📈 Resumen General", 
@@ -188,18 +344,7 @@ if df is not None:
         # Gráfico de torta para estados del compresor
         st.subheader("🔄 Distribución de Estados del Compresor")
         
-        conteo_estados = df_filtrado['estado_compresor'].value_counts().reset_index()
-        conteo_estados.columns = ['Estado', 'Cantidad']
-        
-        fig_pie = px.pie(
-            conteo_estados,
-            values='Cantidad',
-            names='Estado',
-            title='Distribución del Tiempo por Estado',
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        fig_pie.update_traces(textposition='inside', textinfo='percent+label+value')
-        st.plotly_chart(fig_pie, width='stretch')
+        mostrar_figura_cache(clave_figura('pie'), figura_estados, df_filtrado)
     
     # TAB 2: SERIES TEMPORALES
     with tab2:
@@ -208,78 +353,62 @@ if df is not None:
         # Gráfico de temperatura en el tiempo
         st.subheader("🌡️ Temperatura de Descarga en el Tiempo")
         
-        fig_temp = go.Figure()
-        
-        for estado in df_filtrado['estado_compresor'].unique():
-            df_estado = df_filtrado[df_filtrado['estado_compresor'] == estado]
-            fig_temp.add_trace(go.Scatter(
-                x=df_estado['fecha_hora'],
-                y=df_estado['temperatura'],
-                mode='lines',
-                name=f'Estado {estado}',
-                line=dict(width=1)
-            ))
-        
-        fig_temp.update_layout(
-            xaxis_title="Fecha y Hora",
-            yaxis_title="Temperatura (°C)",
-            hovermode='x unified',
-            height=400
-        )
-        st.plotly_chart(fig_temp, width='stretch')
+        mostrar_figura_cache(clave_figura('temp'), figura_serie_por_estado, df_filtrado, 'temperatura', "Temperatura (°C)")
         
         # Gráfico de presión en el tiempo
         st.subheader("⚡ Presión Interna en el Tiempo")
         
-        fig_presion = go.Figure()
-        
-        for estado in df_filtrado['estado_compresor'].unique():
-            df_estado = df_filtrado[df_filtrado['estado_compresor'] == estado]
-            fig_presion.add_trace(go.Scatter(
-                x=df_estado['fecha_hora'],
-                y=df_estado['presion'],
-                mode='lines',
-                name=f'Estado {estado}',
-                line=dict(width=1)
-            ))
-        
-        fig_presion.update_layout(
-            xaxis_title="Fecha y Hora",
-            yaxis_title="Presión (bar)",
-            hovermode='x unified',
-            height=400
-        )
-        st.plotly_chart(fig_presion, width='stretch')
+        mostrar_figura_cache(clave_figura('presion'), figura_serie_por_estado, df_filtrado, 'presion', "Presión (bar)")
         
         # Gráfico combinado con subplots
         st.subheader("📊 Vista Combinada: Temperatura y Presión")
         
-        fig_combined = make_subplots(
-            rows=2, cols=1,
-            subplot_titles=('Temperatura de Descarga', 'Presión Interna'),
-            vertical_spacing=0.1
-        )
+        mostrar_figura('combinada')
         
-        # Temperatura
-        fig_combined.add_trace(
-            go.Scatter(x=df_filtrado['fecha_hora'], y=df_filtrado['temperatura'],
-                      mode='lines', name='Temperatura', line=dict(color='red', width=1)),
-            row=1, col=1
-        )
+        # Calidad del muestreo sobre la rejilla de 30 s
+        st.subheader("🕳️ Huecos y Duplicados en el Muestreo")
         
-        # Presión
-        fig_combined.add_trace(
-            go.Scatter(x=df_filtrado['fecha_hora'], y=df_filtrado['presion'],
-                      mode='lines', name='Presión', line=dict(color='blue', width=1)),
-            row=2, col=1
-        )
+        rejilla = resultado_tarea(futuro_rejilla, "⏳ Construyendo la rejilla de muestreo...")
+        
+        if rejilla is not None:
+            i_inicio, i_fin, _ = rejilla.seleccion(*seleccion)
+            huecos = detectar_huecos(rejilla, i_inicio, i_fin)
+            total_posiciones = max(i_fin - i_inicio, 1)
+            muestras_faltantes = int(huecos['muestras_faltantes'].sum())
         
-        fig_combined.update_xaxes(title_text="Fecha y Hora", row=2, col=1)
-        fig_combined.update_yaxes(title_text="Temperatura (°C)", row=1, col=1)
-        fig_combined.update_yaxes(title_text="Presión (bar)", row=2, col=1)
-        fig_combined.update_layout(height=700, showlegend=True)
+            col1, col2, col3, col4 = st.columns(4)
         
-        st.plotly_chart(fig_combined, width='stretch')
+            with col1:
+                st.metric("Huecos Detectados", f"{len(huecos):,}")
+            with col2:
+                st.metric(
+                    "Muestras Faltantes",
+                    f"{muestras_faltantes:,}",
+                    help=f"Posiciones de {rejilla.periodo_s} s sin medición en el rango seleccionado"
+                )
+            with col3:
+                st.metric("Cobertura", f"{100 * (1 - muestras_faltantes / total_posiciones):.1f}%")
+            with col4:
+                st.metric(
+                    "Duplicados",
+                    f"{rejilla.duplicados_en(i_inicio, i_fin):,}",
+                    help="Registros que cayeron en la misma posición de la rejilla (se conserva el primero)"
+                )
+        
+            if rejilla.desalineados:
+                st.warning(f"⚠️ {rejilla.desalineados:,} registros de todo el archivo no coinciden con la cadencia de {rejilla.periodo_s} s y se ajustaron a la posición más cercana")
+        
+            if len(huecos) > 0:
+                huecos_mostrar = huecos.sort_values('muestras_faltantes', ascending=False).copy()
+                huecos_mostrar['duracion'] = huecos_mostrar['duracion'].astype(str)
+                with st.expander(f"Ver huecos ({len(huecos):,})"):
+                    st.dataframe(
+                        huecos_mostrar[['inicio', 'fin', 'duracion', 'muestras_faltantes']],
+                        width='stretch',
+                        hide_index=True
+                    )
+            else:
+                st.success("✅ Sin huecos en el rango seleccionado")
     
     # TAB 3: DISTRIBUCIONES
     with tab3:
@@ -290,54 +419,32 @@ if df is not None:
         with col1:
             # Histograma de temperatura
             st.subheader("📊 Distribución de Temperatura")
-            fig_hist_temp = px.histogram(
-                df_filtrado,
-                x='temperatura',
-                color='estado_compresor',
-                nbins=50,
-                title='Histograma de Temperatura por Estado',
-                labels={'temperatura': 'Temperatura (°C)', 'estado_compresor': 'Estado'},
-                marginal='box'
+            mostrar_figura_cache(
+                clave_figura('hist_temp'), figura_histograma, df_filtrado,
+                'temperatura', 'Histograma de Temperatura por Estado', 'Temperatura (°C)'
             )
-            st.plotly_chart(fig_hist_temp, width='stretch')
             
             # Box plot de temperatura
             st.subheader("📦 Box Plot de Temperatura")
-            fig_box_temp = px.box(
-                df_filtrado,
-                x='estado_compresor',
-                y='temperatura',
-                color='estado_compresor',
-                title='Distribución de Temperatura por Estado',
-                labels={'temperatura': 'Temperatura (°C)', 'estado_compresor': 'Estado'}
+            mostrar_figura_cache(
+                clave_figura('box_temp'), figura_box, df_filtrado,
+                'temperatura', 'Distribución de Temperatura por Estado', 'Temperatura (°C)'
             )
-            st.plotly_chart(fig_box_temp, width='stretch')
         
         with col2:
             # Histograma de presión
             st.subheader("📊 Distribución de Presión")
-            fig_hist_presion = px.histogram(
-                df_filtrado,
-                x='presion',
-                color='estado_compresor',
-                nbins=50,
-                title='Histograma de Presión por Estado',
-                labels={'presion': 'Presión (bar)', 'estado_compresor': 'Estado'},
-                marginal='box'
+            mostrar_figura_cache(
+                clave_figura('hist_presion'), figura_histograma, df_filtrado,
+                'presion', 'Histograma de Presión por Estado', 'Presión (bar)'
             )
-            st.plotly_chart(fig_hist_presion, width='stretch')
             
             # Box plot de presión
             st.subheader("📦 Box Plot de Presión")
-            fig_box_presion = px.box(
-                df_filtrado,
-                x='estado_compresor',
-                y='presion',
-                color='estado_compresor',
-                title='Distribución de Presión por Estado',
-                labels={'presion': 'Presión (bar)', 'estado_compresor': 'Estado'}
+            mostrar_figura_cache(
+                clave_figura('box_presion'), figura_box, df_filtrado,
+                'presion', 'Distribución de Presión por Estado', 'Presión (bar)'
             )
-            st.plotly_chart(fig_box_presion, width='stretch')
         
         # Violin plots
         st.markdown("---")
@@ -346,28 +453,10 @@ if df is not None:
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_violin_temp = px.violin(
-                df_filtrado,
-                x='estado_compresor',
-                y='temperatura',
-                color='estado_compresor',
-                box=True,
-                title='Violin Plot - Temperatura',
-                labels={'temperatura': 'Temperatura (°C)', 'estado_compresor': 'Estado'}
-            )
-            st.plotly_chart(fig_violin_temp, width='stretch')
+            mostrar_figura('violin_temp')
         
         with col2:
-            fig_violin_presion = px.violin(
-                df_filtrado,
-                x='estado_compresor',
-                y='presion',
-                color='estado_compresor',
-                box=True,
-                title='Violin Plot - Presión',
-                labels={'presion': 'Presión (bar)', 'estado_compresor': 'Estado'}
-            )
-            st.plotly_chart(fig_violin_presion, width='stretch')
+            mostrar_figura('violin_presion')
     
     # TAB 4: CORRELACIONES
     with tab4:
@@ -376,17 +465,7 @@ if df is not None:
         # Scatter plot temperatura vs presión
         st.subheader("🔗 Relación entre Temperatura y Presión")
         
-        fig_scatter = px.scatter(
-            df_filtrado,
-            x='presion',
-            y='temperatura',
-            color='estado_compresor',
-            title='Temperatura vs Presión por Estado del Compresor',
-            labels={'presion': 'Presión (bar)', 'temperatura': 'Temperatura (°C)', 'estado_compresor': 'Estado'},
-            opacity=0.6,
-            trendline='ols'
-        )
-        st.plotly_chart(fig_scatter, width='stretch')
+        mostrar_figura('dispersion_ols')
         
         # Matriz de correlación
         st.subheader("📊 Matriz de Correlación")
@@ -398,23 +477,7 @@ if df is not None:
             df_numeric = df_filtrado[['temperatura', 'presion']].copy()
             corr_matrix = df_numeric.corr()
             
-            fig_corr = go.Figure(data=go.Heatmap(
-                z=corr_matrix.values,
-                x=['Temperatura', 'Presión'],
-                y=['Temperatura', 'Presión'],
-                colorscale='RdBu',
-                zmid=0,
-                text=corr_matrix.values,
-                texttemplate='%{text:.3f}',
-                textfont={"size": 16},
-                colorbar=dict(title="Correlación")
-            ))
-            
-            fig_corr.update_layout(
-                title='Matriz de Correlación',
-                height=400
-            )
-            st.plotly_chart(fig_corr, width='stretch')
+            mostrar_figura_cache(clave_figura('corr'), figura_matriz_correlacion, corr_matrix)
         
         with col2:
             st.markdown("### Interpretación")
@@ -449,6 +512,80 @@ if df is not None:
             
             with cols[idx]:
                 st.metric(f"Estado {estado}", f"{corr_estado:.3f}")
+        
+        # Correlación con desfase sobre la rejilla regular (FFT por bloques)
+        st.markdown("---")
+        st.subheader("⏱️ Correlación Cruzada con Desfase")
+        
+        col1, col2 = st.columns([1, 3])
+        
+        with col1:
+            # El valor se lee de session_state antes de las pestañas para lanzar el cálculo antes
+            st.number_input(
+                "Desfase máximo (minutos)",
+                min_value=1,
+                max_value=240,
+                value=30,
+                step=5,
+                key='max_desfase_min'
+            )
+        
+        # El análisis se calcula en segundo plano y se guarda en la cache junto a su figura
+        with col2:
+            analisis_desfase = resultado_tarea(planificador.tarea(tarea_desfase))
+        
+        with col1:
+            if analisis_desfase is None:
+                pass
+            elif analisis_desfase['pico_s'] is not None:
+                st.metric(
+                    "Desfase del Pico",
+                    f"{analisis_desfase['pico_s']:+,} s",
+                    help="Positivo: la temperatura responde después de la presión"
+                )
+                st.metric("Correlación en el Pico", f"{analisis_desfase['pico']:.3f}")
+            else:
+                st.warning("⚠️ No hay suficientes muestras válidas para calcular la correlación")
+        
+        if analisis_desfase is not None:
+            with col2:
+                mostrar_figura_cache(clave_figura('desfase', max_desfase), figura_desfase, analisis_desfase)
+        
+        # Espectro de potencia para encontrar el ciclo de carga/descarga
+        st.subheader("📡 Espectro de Potencia (Welch)")
+        
+        col1, col2 = st.columns([1, 3])
+        
+        with col1:
+            st.select_slider(
+                "Muestras por segmento",
+                options=[64, 128, 256, 512, 1024, 2048],
+                value=256,
+                help=f"Cada muestra equivale a {PERIODO_MUESTREO_S} s; segmentos más largos dan más resolución en frecuencia",
+                key='nperseg'
+            )
+        
+        with col2:
+            espectros = resultado_tarea(planificador.tarea(tarea_espectro))
+        
+        with col1:
+            for espectro in espectros or []:
+                nombre, _ = ESTILO_VARIABLES[espectro['variable']]
+                if np.isfinite(espectro['dominante']):
+                    st.metric(
+                        f"Ciclo Dominante - {nombre}",
+                        f"{1 / espectro['dominante'] / 60:.1f} min",
+                        f"{espectro['segmentos']} segmentos",
+                        delta_color='off'
+                    )
+                elif espectro['segmentos'] == 0:
+                    st.warning(f"⚠️ {nombre}: ningún segmento tiene suficientes muestras válidas")
+                else:
+                    st.info(f"{nombre}: el espectro no muestra ningún ciclo definido")
+        
+        if espectros is not None:
+            with col2:
+                mostrar_figura_cache(clave_figura('espectro', nperseg), figura_espectro, espectros)
     
     # TAB 5: ANÁLISIS CRUZADO
     with tab5:
@@ -458,47 +595,7 @@ if df is not None:
         # Gráfico 3D interactivo
         st.subheader("🎲 Visualización 3D: Tiempo, Temperatura y Presión por Estado")
         
-        # Preparar datos para el gráfico 3D
-        df_3d = df_filtrado.copy()
-        df_3d['minutos_desde_inicio'] = (df_3d['fecha_hora'] - df_3d['fecha_hora'].min()).dt.total_seconds() / 60
-        
-        fig_3d = go.Figure()
-        
-        for estado in sorted(df_filtrado['estado_compresor'].unique()):
-            df_estado = df_3d[df_3d['estado_compresor'] == estado]
-            fig_3d.add_trace(go.Scatter3d(
-                x=df_estado['minutos_desde_inicio'],
-                y=df_estado['temperatura'],
-                z=df_estado['presion'],
-                mode='markers',
-                name=f'Estado {estado}',
-                marker=dict(
-                    size=3,
-                    opacity=0.6,
-                    color=df_estado['temperatura'],
-                    colorscale='Viridis',
-                    showscale=True if estado == sorted(df_filtrado['estado_compresor'].unique())[0] else False,
-                    colorbar=dict(title="Temp (°C)")
-                ),
-                text=[f"Tiempo: {t.strftime('%Y-%m-%d %H:%M')}<br>Estado: {e}<br>Temp: {temp:.1f}°C<br>Presión: {p:.2f} bar"
-                      for t, e, temp, p in zip(df_estado['fecha_hora'], df_estado['estado_compresor'], 
-                                                df_estado['temperatura'], df_estado['presion'])],
-                hoverinfo='text'
-            ))
-        
-        fig_3d.update_layout(
-            scene=dict(
-                xaxis_title='Tiempo (minutos desde inicio)',
-                yaxis_title='Temperatura (°C)',
-                zaxis_title='Presión (bar)',
-                camera=dict(
-                    eye=dict(x=1.5, y=1.5, z=1.3)
-                )
-            ),
-            height=600,
-            showlegend=True
-        )
-        st.plotly_chart(fig_3d, width='stretch')
+        mostrar_figura('3d')
         
         st.markdown("---")
         
@@ -508,36 +605,7 @@ if df is not None:
         col1, col2 = st.columns([3, 1])
         
         with col1:
-            # Crear bins de tiempo y calcular promedios
-            df_heatmap = df_filtrado.copy()
-            df_heatmap['hora_del_dia'] = df_heatmap['fecha_hora'].dt.hour + df_heatmap['fecha_hora'].dt.minute / 60
-            
-            # Crear bins para temperatura y presión
-            temp_bins = pd.cut(df_heatmap['temperatura'], bins=20)
-            presion_bins = pd.cut(df_heatmap['presion'], bins=20)
-            
-            # Contar ocurrencias
-            heatmap_data = df_heatmap.groupby([temp_bins, presion_bins]).size().reset_index(name='count')
-            heatmap_data['temp_mid'] = heatmap_data[heatmap_data.columns[0]].apply(lambda x: x.mid)
-            heatmap_data['presion_mid'] = heatmap_data[heatmap_data.columns[1]].apply(lambda x: x.mid)
-            
-            # Crear pivot table
-            pivot = heatmap_data.pivot_table(values='count', index='temp_mid', columns='presion_mid', fill_value=0)
-            
-            fig_heatmap = go.Figure(data=go.Heatmap(
-                z=pivot.values,
-                x=pivot.columns,
-                y=pivot.index,
-                colorscale='YlOrRd',
-                colorbar=dict(title='Frecuencia')
-            ))
-            
-            fig_heatmap.update_layout(
-                xaxis_title='Presión (bar)',
-                yaxis_title='Temperatura (°C)',
-                height=500
-            )
-            st.plotly_chart(fig_heatmap, width='stretch')
+            mostrar_figura('mapa_calor')
         
         with col2:
             st.markdown("### 📊 Interpretación")
@@ -556,30 +624,7 @@ if df is not None:
         # Gráfico de burbujas: 4 variables en 2D
         st.subheader("🫧 Gráfico de Burbujas: Las 4 Variables en una Vista")
         
-        # Muestreo para mejor rendimiento si hay muchos datos
-        df_sample = df_filtrado if len(df_filtrado) < 5000 else df_filtrado.sample(5000)
-        df_sample = df_sample.copy()
-        df_sample['minutos'] = (df_sample['fecha_hora'] - df_sample['fecha_hora'].min()).dt.total_seconds() / 60
-        
-        fig_bubble = px.scatter(
-            df_sample,
-            x='temperatura',
-            y='presion',
-            size='minutos',
-            color='estado_compresor',
-            title='Temperatura vs Presión (Tamaño = Tiempo, Color = Estado)',
-            labels={
-                'temperatura': 'Temperatura (°C)',
-                'presion': 'Presión (bar)',
-                'estado_compresor': 'Estado',
-                'minutos': 'Minutos'
-            },
-            hover_data=['fecha_hora'],
-            size_max=15
-        )
-        
-        fig_bubble.update_layout(height=500)
-        st.plotly_chart(fig_bubble, width='stretch')
+        mostrar_figura_cache(clave_figura('burbujas'), figura_burbujas, df_filtrado)
         
         st.info("💡 **Leyenda:** El tamaño de las burbujas representa el tiempo transcurrido y el color representa el estado del compresor")
         
@@ -588,53 +633,21 @@ if df is not None:
         # Análisis por franjas horarias
         st.subheader("⏰ Análisis por Franjas Horarias")
         
-        df_horario = df_filtrado.copy()
-        df_horario['hora'] = df_horario['fecha_hora'].dt.hour
-        
-        # Definir franjas horarias
-        def clasificar_franja(hora):
-            if 0 <= hora < 6:
-                return '🌙 Madrugada (00:00-06:00)'
-            elif 6 <= hora < 12:
-                return '🌅 Mañana (06:00-12:00)'
-            elif 12 <= hora < 18:
-                return '☀️ Tarde (12:00-18:00)'
-            else:
-                return '🌆 Noche (18:00-00:00)'
-        
-        df_horario['franja'] = df_horario['hora'].apply(clasificar_franja)
-        
         col1, col2 = st.columns(2)
         
         with col1:
             # Temperatura promedio por franja y estado
-            temp_franja = df_horario.groupby(['franja', 'estado_compresor'])['temperatura'].mean().reset_index()
-            
-            fig_temp_franja = px.bar(
-                temp_franja,
-                x='franja',
-                y='temperatura',
-                color='estado_compresor',
-                barmode='group',
-                title='Temperatura Promedio por Franja Horaria y Estado',
-                labels={'temperatura': 'Temperatura (°C)', 'franja': 'Franja Horaria', 'estado_compresor': 'Estado'}
+            mostrar_figura_cache(
+                clave_figura('temp_franja'), figura_franjas, df_filtrado,
+                'temperatura', 'Temperatura Promedio por Franja Horaria y Estado', 'Temperatura (°C)'
             )
-            st.plotly_chart(fig_temp_franja, width='stretch')
         
         with col2:
             # Presión promedio por franja y estado
-            presion_franja = df_horario.groupby(['franja', 'estado_compresor'])['presion'].mean().reset_index()
-            
-            fig_presion_franja = px.bar(
-                presion_franja,
-                x='franja',
-                y='presion',
-                color='estado_compresor',
-                barmode='group',
-                title='Presión Promedia por Franja Horaria y Estado',
-                labels={'presion': 'Presión (bar)', 'franja': 'Franja Horaria', 'estado_compresor': 'Estado'}
+            mostrar_figura_cache(
+                clave_figura('presion_franja'), figura_franjas, df_filtrado,
+                'presion', 'Presión Promedia por Franja Horaria y Estado', 'Presión (bar)'
             )
-            st.plotly_chart(fig_presion_franja, width='stretch')
         
         st.markdown("---")
         
@@ -659,45 +672,7 @@ if df is not None:
         st.markdown("---")
         st.subheader("📈 Serie Temporal con Ejes Duales")
         
-        # Crear submuestra para mejor visualización
-        step = max(1, len(df_filtrado) // 1000)  # Máximo 1000 puntos
-        df_dual = df_filtrado.iloc[::step].copy()
-        
-        fig_dual = make_subplots(specs=[[{"secondary_y": True}]])
-        
-        # Agregar temperatura
-        fig_dual.add_trace(
-            go.Scatter(x=df_dual['fecha_hora'], y=df_dual['temperatura'],
-                      name="Temperatura", line=dict(color='red', width=2)),
-            secondary_y=False
-        )
-        
-        # Agregar presión
-        fig_dual.add_trace(
-            go.Scatter(x=df_dual['fecha_hora'], y=df_dual['presion'],
-                      name="Presión", line=dict(color='blue', width=2)),
-            secondary_y=True
-        )
-        
-        # Agregar marcadores de estado
-        for estado in sorted(df_dual['estado_compresor'].unique()):
-            df_estado = df_dual[df_dual['estado_compresor'] == estado]
-            fig_dual.add_trace(
-                go.Scatter(x=df_estado['fecha_hora'], 
-                          y=df_estado['temperatura'],
-                          mode='markers',
-                          name=f'Estado {estado}',
-                          marker=dict(size=4, opacity=0.5),
-                          showlegend=True),
-                secondary_y=False
-            )
-        
-        fig_dual.update_xaxes(title_text="Tiempo")
-        fig_dual.update_yaxes(title_text="Temperatura (°C)", secondary_y=False)
-        fig_dual.update_yaxes(title_text="Presión (bar)", secondary_y=True)
-        fig_dual.update_layout(height=500, hovermode='x unified')
-        
-        st.plotly_chart(fig_dual, width='stretch')
+        mostrar_figura_cache(clave_figura('ejes_duales'), figura_ejes_duales, df_filtrado)
     
     # TAB 6: DATOS DETALLADOS
     with tab6:
@@ -782,6 +757,20 @@ else:
     **Nota:** Los decimales deben estar separados por coma (,) en formato europeo.
     """)
 
+# Uso de la cache de figuras (se muestra al final para incluir las tareas en segundo plano)
+with st.sidebar:
+    st.markdown("---")
+    with st.expander("⚡ Cache de gráficos"):
+        stats_cache = cache_figuras.estadisticas()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Aciertos", f"{stats_cache['aciertos']:,}")
+            st.metric("Entradas", f"{stats_cache['figuras']:,}")
+        with col2:
+            st.metric("Fallos", f"{stats_cache['fallos']:,}")
+            st.metric("Tamaño", f"{stats_cache['bytes'] / 1024 ** 2:.1f} MB")
+        st.caption(f"Tasa de aciertos: {stats_cache['tasa_aciertos']:.0%} · Descartadas: {stats_cache['descartes']:,}")
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -793,3 +782,12 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# Mientras haya tareas en curso, un fragmento las revisa periódicamente sin bloquear
+# el script y vuelve a ejecutar la app cuando termina alguna para rellenar los marcadores
+if tareas_pendientes:
+    @st.fragment(run_every="0.5s")
+    def vigilar_tareas():
+        if any(futuro.done() for futuro in tareas_pendientes):
+            st.rerun()
+
+    vigilar_tareas()
@@ -0,0 +1,116 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from plotly.basedatatypes import BaseFigure
+
+# Tamaño máximo por defecto de lo guardado en la cache (bytes)
+MAX_BYTES_CACHE_FIGURAS = 256 * 1024 * 1024
+
+# Atributos de las trazas (y de su `marker`) que concentran los datos de una figura
+_ATRIBUTOS_DATOS = ('x', 'y', 'z', 'text', 'customdata', 'values', 'labels')
+_ATRIBUTOS_MARKER = ('color', 'colors', 'size')
+
+
+# Bytes de un array de una traza; los escalares y cadenas sueltas no cuentan
+def _tamano_array(valores):
+    if valores is None or isinstance(valores, (str, int, float)):
+        return 0
+    return np.asarray(valores).nbytes
+
+
+# Tamaño aproximado de una figura a partir de los arrays de sus trazas, sin serializarla
+def _tamano_figura(figura):
+    total = 0
+    for traza in figura.data:
+        for atributo in _ATRIBUTOS_DATOS:
+            if atributo in traza:
+                total += _tamano_array(traza[atributo])
+        if 'marker' in traza:
+            for atributo in _ATRIBUTOS_MARKER:
+                if atributo in traza.marker:
+                    total += _tamano_array(traza.marker[atributo])
+    return total
+
+
+# Tamaño aproximado de un valor guardado: arrays de las trazas para figuras, nbytes para arrays
+def _tamano(valor):
+    if isinstance(valor, BaseFigure):
+        return _tamano_figura(valor)
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, dict):
+        return sum(_tamano(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(_tamano(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheFiguras:
+    """Cache LRU de figuras Plotly y de los resultados con que se construyen.
+
+    La clave debe incluir la huella del dataset, los filtros que afectan al
+    gráfico y su identificador, p. ej. `(clave_datos, filtros, 'fig_3d')`.
+    Las figuras se guardan como objetos `go.Figure` ya validados, que
+    Streamlit serializa sin volver a validarlos; no deben modificarse después
+    de guardarlas porque se comparten entre sesiones. Cuando el total de bytes
+    supera `max_bytes` se descartan los valores usados hace más tiempo.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES_CACHE_FIGURAS):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._valores = OrderedDict()
+        self._tamanos = {}
+        self._bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.descartes = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            if clave not in self._valores:
+                self.fallos += 1
+                return None
+            self._valores.move_to_end(clave)
+            self.aciertos += 1
+            return self._valores[clave]
+
+    # Guarda el valor y lo devuelve
+    def guardar(self, clave, valor):
+        tamano = _tamano(valor)
+        with self._lock:
+            if clave in self._valores:
+                del self._valores[clave]
+                self._bytes -= self._tamanos.pop(clave)
+            # Un valor más grande que el límite se devuelve sin guardarlo
+            if tamano > self.max_bytes:
+                return valor
+            self._valores[clave] = valor
+            self._tamanos[clave] = tamano
+            self._bytes += tamano
+            while self._bytes > self.max_bytes:
+                descartada, _ = self._valores.popitem(last=False)
+                self._bytes -= self._tamanos.pop(descartada)
+                self.descartes += 1
+        return valor
+
+    # Devuelve el valor en cache o lo construye con `constructor(*args)`
+    def obtener_o_crear(self, clave, constructor, *args, **kwargs):
+        valor = self.obtener(clave)
+        if valor is None:
+            valor = self.guardar(clave, constructor(*args, **kwargs))
+        return valor
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'figuras': len(self._valores),
+                'bytes': self._bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'descartes': self.descartes,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
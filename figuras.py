@@ -0,0 +1,383 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Constructores de las figuras. No usan Streamlit, así que pueden
+# ejecutarse en los hilos del planificador mientras se dibujan las otras pestañas.
+
+
+# Dispersión temperatura vs presión con recta de regresión OLS
+def figura_dispersion_ols(df):
+    return px.scatter(
+        df,
+        x='presion',
+        y='temperatura',
+        color='estado_compresor',
+        title='Temperatura vs Presión por Estado del Compresor',
+        labels={'presion': 'Presión (bar)', 'temperatura': 'Temperatura (°C)', 'estado_compresor': 'Estado'},
+        opacity=0.6,
+        trendline='ols'
+    )
+
+
+# Gráfico de violín de una variable por estado
+def figura_violin(df, variable, titulo, etiqueta):
+    return px.violin(
+        df,
+        x='estado_compresor',
+        y=variable,
+        color='estado_compresor',
+        box=True,
+        title=titulo,
+        labels={variable: etiqueta, 'estado_compresor': 'Estado'}
+    )
+
+
+# Visualización 3D: tiempo, temperatura y presión por estado
+def figura_3d(df):
+    df_3d = df.copy()
+    df_3d['minutos_desde_inicio'] = (df_3d['fecha_hora'] - df_3d['fecha_hora'].min()).dt.total_seconds() / 60
+
+    fig_3d = go.Figure()
+    estados = sorted(df['estado_compresor'].unique())
+
+    for estado in estados:
+        df_estado = df_3d[df_3d['estado_compresor'] == estado]
+        fig_3d.add_trace(go.Scatter3d(
+            x=df_estado['minutos_desde_inicio'],
+            y=df_estado['temperatura'],
+            z=df_estado['presion'],
+            mode='markers',
+            name=f'Estado {estado}',
+            marker=dict(
+                size=3,
+                opacity=0.6,
+                color=df_estado['temperatura'],
+                colorscale='Viridis',
+                showscale=True if estado == estados[0] else False,
+                colorbar=dict(title="Temp (°C)")
+            ),
+            text=[f"Tiempo: {t.strftime('%Y-%m-%d %H:%M')}<br>Estado: {e}<br>Temp: {temp:.1f}°C<br>Presión: {p:.2f} bar"
+                  for t, e, temp, p in zip(df_estado['fecha_hora'], df_estado['estado_compresor'],
+                                            df_estado['temperatura'], df_estado['presion'])],
+            hoverinfo='text'
+        ))
+
+    fig_3d.update_layout(
+        scene=dict(
+            xaxis_title='Tiempo (minutos desde inicio)',
+            yaxis_title='Temperatura (°C)',
+            zaxis_title='Presión (bar)',
+            camera=dict(
+                eye=dict(x=1.5, y=1.5, z=1.3)
+            )
+        ),
+        height=600,
+        showlegend=True
+    )
+    return fig_3d
+
+
+# Mapa de calor de frecuencias temperatura/presión
+def figura_mapa_calor(df):
+    # Crear bins de tiempo y calcular promedios
+    df_heatmap = df.copy()
+    df_heatmap['hora_del_dia'] = df_heatmap['fecha_hora'].dt.hour + df_heatmap['fecha_hora'].dt.minute / 60
+
+    # Crear bins para temperatura y presión
+    temp_bins = pd.cut(df_heatmap['temperatura'], bins=20)
+    presion_bins = pd.cut(df_heatmap['presion'], bins=20)
+
+    # Contar ocurrencias
+    heatmap_data = df_heatmap.groupby([temp_bins, presion_bins]).size().reset_index(name='count')
+    heatmap_data['temp_mid'] = heatmap_data[heatmap_data.columns[0]].apply(lambda x: x.mid)
+    heatmap_data['presion_mid'] = heatmap_data[heatmap_data.columns[1]].apply(lambda x: x.mid)
+
+    # Crear pivot table
+    pivot = heatmap_data.pivot_table(values='count', index='temp_mid', columns='presion_mid', fill_value=0)
+
+    fig_heatmap = go.Figure(data=go.Heatmap(
+        z=pivot.values,
+        x=pivot.columns,
+        y=pivot.index,
+        colorscale='YlOrRd',
+        colorbar=dict(title='Frecuencia')
+    ))
+
+    fig_heatmap.update_layout(
+        xaxis_title='Presión (bar)',
+        yaxis_title='Temperatura (°C)',
+        height=500
+    )
+    return fig_heatmap
+
+
+# Gráfico de torta con la distribución de estados
+def figura_estados(df):
+    conteo_estados = df['estado_compresor'].value_counts().reset_index()
+    conteo_estados.columns = ['Estado', 'Cantidad']
+
+    fig_pie = px.pie(
+        conteo_estados,
+        values='Cantidad',
+        names='Estado',
+        title='Distribución del Tiempo por Estado',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig_pie.update_traces(textposition='inside', textinfo='percent+label+value')
+    return fig_pie
+
+
+# Serie temporal de una variable con una traza por estado
+def figura_serie_por_estado(df, variable, etiqueta):
+    fig = go.Figure()
+
+    for estado in df['estado_compresor'].unique():
+        df_estado = df[df['estado_compresor'] == estado]
+        fig.add_trace(go.Scatter(
+            x=df_estado['fecha_hora'],
+            y=df_estado[variable],
+            mode='lines',
+            name=f'Estado {estado}',
+            line=dict(width=1)
+        ))
+
+    fig.update_layout(
+        xaxis_title="Fecha y Hora",
+        yaxis_title=etiqueta,
+        hovermode='x unified',
+        height=400
+    )
+    return fig
+
+
+# Vista combinada de temperatura y presión sobre la rejilla regular
+def figura_combinada(rejilla, i_inicio, i_fin, mascara_estado=None):
+    fig_combined = make_subplots(
+        rows=2, cols=1,
+        subplot_titles=('Temperatura de Descarga', 'Presión Interna'),
+        vertical_spacing=0.1
+    )
+
+    # Los huecos quedan como NaN en la rejilla y la línea se corta en ellos
+    tiempos_rejilla = rejilla.tiempos(i_inicio, i_fin)
+    # Con un estado filtrado quedan muestras aisladas, se marcan para que sigan visibles
+    modo_rejilla = 'lines' if mascara_estado is None else 'lines+markers'
+
+    # Temperatura
+    fig_combined.add_trace(
+        go.Scatter(x=tiempos_rejilla, y=rejilla.serie('temperatura', i_inicio, i_fin, mascara_estado),
+                   mode=modo_rejilla, name='Temperatura', line=dict(color='red', width=1),
+                   marker=dict(size=2)),
+        row=1, col=1
+    )
+
+    # Presión
+    fig_combined.add_trace(
+        go.Scatter(x=tiempos_rejilla, y=rejilla.serie('presion', i_inicio, i_fin, mascara_estado),
+                   mode=modo_rejilla, name='Presión', line=dict(color='blue', width=1),
+                   marker=dict(size=2)),
+        row=2, col=1
+    )
+
+    fig_combined.update_xaxes(title_text="Fecha y Hora", row=2, col=1)
+    fig_combined.update_yaxes(title_text="Temperatura (°C)", row=1, col=1)
+    fig_combined.update_yaxes(title_text="Presión (bar)", row=2, col=1)
+    fig_combined.update_layout(height=700, showlegend=True)
+    return fig_combined
+
+
+# Histograma de una variable por estado, con box plot marginal
+def figura_histograma(df, variable, titulo, etiqueta):
+    return px.histogram(
+        df,
+        x=variable,
+        color='estado_compresor',
+        nbins=50,
+        title=titulo,
+        labels={variable: etiqueta, 'estado_compresor': 'Estado'},
+        marginal='box'
+    )
+
+
+# Box plot de una variable por estado
+def figura_box(df, variable, titulo, etiqueta):
+    return px.box(
+        df,
+        x='estado_compresor',
+        y=variable,
+        color='estado_compresor',
+        title=titulo,
+        labels={variable: etiqueta, 'estado_compresor': 'Estado'}
+    )
+
+
+# Matriz de correlación temperatura/presión
+def figura_matriz_correlacion(corr_matrix):
+    fig_corr = go.Figure(data=go.Heatmap(
+        z=corr_matrix.values,
+        x=['Temperatura', 'Presión'],
+        y=['Temperatura', 'Presión'],
+        colorscale='RdBu',
+        zmid=0,
+        text=corr_matrix.values,
+        texttemplate='%{text:.3f}',
+        textfont={"size": 16},
+        colorbar=dict(title="Correlación")
+    ))
+
+    fig_corr.update_layout(
+        title='Matriz de Correlación',
+        height=400
+    )
+    return fig_corr
+
+
+# Correlación cruzada en función del desfase (resultado de `analizar_desfase`)
+def figura_desfase(analisis):
+    fig_desfase = go.Figure(go.Scatter(
+        x=analisis['desfases_s'],
+        y=analisis['correlacion'],
+        mode='lines',
+        line=dict(color='purple', width=2)
+    ))
+    fig_desfase.add_vline(x=0, line_dash='dash', line_color='gray')
+    fig_desfase.update_layout(
+        title='Correlación Presión(t) vs Temperatura(t + desfase)',
+        xaxis_title='Desfase (s)',
+        yaxis_title='Correlación',
+        height=400
+    )
+    return fig_desfase
+
+
+# Nombre y color de cada variable en los gráficos de espectro
+ESTILO_VARIABLES = {
+    'temperatura': ('Temperatura', 'red'),
+    'presion': ('Presión', 'blue'),
+}
+
+
+# Espectros de Welch (resultado de `analizar_espectros`)
+def figura_espectro(espectros):
+    fig_espectro = go.Figure()
+
+    for espectro in espectros:
+        nombre, color = ESTILO_VARIABLES[espectro['variable']]
+        fig_espectro.add_trace(go.Scatter(
+            x=espectro['frecuencias'][1:] * 3600,
+            y=espectro['densidad'][1:],
+            mode='lines',
+            name=nombre,
+            line=dict(color=color, width=1)
+        ))
+
+    fig_espectro.update_layout(
+        xaxis_title='Frecuencia (ciclos por hora)',
+        yaxis_title='Densidad espectral',
+        yaxis_type='log',
+        height=400
+    )
+    return fig_espectro
+
+
+# Gráfico de burbujas: 4 variables en 2D
+def figura_burbujas(df):
+    # Muestreo para mejor rendimiento si hay muchos datos
+    df_sample = df if len(df) < 5000 else df.sample(5000)
+    df_sample = df_sample.copy()
+    df_sample['minutos'] = (df_sample['fecha_hora'] - df_sample['fecha_hora'].min()).dt.total_seconds() / 60
+
+    fig_bubble = px.scatter(
+        df_sample,
+        x='temperatura',
+        y='presion',
+        size='minutos',
+        color='estado_compresor',
+        title='Temperatura vs Presión (Tamaño = Tiempo, Color = Estado)',
+        labels={
+            'temperatura': 'Temperatura (°C)',
+            'presion': 'Presión (bar)',
+            'estado_compresor': 'Estado',
+            'minutos': 'Minutos'
+        },
+        hover_data=['fecha_hora'],
+        size_max=15
+    )
+
+    fig_bubble.update_layout(height=500)
+    return fig_bubble
+
+
+# Definir franjas horarias
+def clasificar_franja(hora):
+    if 0 <= hora < 6:
+        return '🌙 Madrugada (00:00-06:00)'
+    elif 6 <= hora < 12:
+        return '🌅 Mañana (06:00-12:00)'
+    elif 12 <= hora < 18:
+        return '☀️ Tarde (12:00-18:00)'
+    else:
+        return '🌆 Noche (18:00-00:00)'
+
+
+# Promedio de una variable por franja horaria y estado
+def figura_franjas(df, variable, titulo, etiqueta):
+    df_horario = df.copy()
+    df_horario['hora'] = df_horario['fecha_hora'].dt.hour
+    df_horario['franja'] = df_horario['hora'].apply(clasificar_franja)
+
+    promedio_franja = df_horario.groupby(['franja', 'estado_compresor'])[variable].mean().reset_index()
+
+    return px.bar(
+        promedio_franja,
+        x='franja',
+        y=variable,
+        color='estado_compresor',
+        barmode='group',
+        title=titulo,
+        labels={variable: etiqueta, 'franja': 'Franja Horaria', 'estado_compresor': 'Estado'}
+    )
+
+
+# Serie temporal con ejes duales y marcadores de estado
+def figura_ejes_duales(df):
+    # Crear submuestra para mejor visualización
+    step = max(1, len(df) // 1000)  # Máximo 1000 puntos
+    df_dual = df.iloc[::step].copy()
+
+    fig_dual = make_subplots(specs=[[{"secondary_y": True}]])
+
+    # Agregar temperatura
+    fig_dual.add_trace(
+        go.Scatter(x=df_dual['fecha_hora'], y=df_dual['temperatura'],
+                   name="Temperatura", line=dict(color='red', width=2)),
+        secondary_y=False
+    )
+
+    # Agregar presión
+    fig_dual.add_trace(
+        go.Scatter(x=df_dual['fecha_hora'], y=df_dual['presion'],
+                   name="Presión", line=dict(color='blue', width=2)),
+        secondary_y=True
+    )
+
+    # Agregar marcadores de estado
+    for estado in sorted(df_dual['estado_compresor'].unique()):
+        df_estado = df_dual[df_dual['estado_compresor'] == estado]
+        fig_dual.add_trace(
+            go.Scatter(x=df_estado['fecha_hora'],
+                       y=df_estado['temperatura'],
+                       mode='markers',
+                       name=f'Estado {estado}',
+                       marker=dict(size=4, opacity=0.5),
+                       showlegend=True),
+            secondary_y=False
+        )
+
+    fig_dual.update_xaxes(title_text="Tiempo")
+    fig_dual.update_yaxes(title_text="Temperatura (°C)", secondary_y=False)
+    fig_dual.update_yaxes(title_text="Presión (bar)", secondary_y=True)
+    fig_dual.update_layout(height=500, hovermode='x unified')
+    return fig_dual
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Tamaño de cada bloque muestreado y número de bloques por huella
+TAMANO_BLOQUE = 64 * 1024
+BLOQUES_MUESTRA = 16
+
+# Hashes completos que recuerda el registro antes de descartar los más antiguos
+MAX_REGISTROS = 128
+
+
+# Posiciones de los bloques muestreados: inicio, final y puntos equiespaciados
+def _posiciones_muestra(tamano, bloques=BLOQUES_MUESTRA, tamano_bloque=TAMANO_BLOQUE):
+    if tamano <= bloques * tamano_bloque:
+        return [0] if tamano else []
+    ultimo = tamano - tamano_bloque
+    return sorted({ultimo * i // (bloques - 1) for i in range(bloques)})
+
+
+# Huella rápida de un buffer en memoria (p. ej. `UploadedFile.getbuffer()`)
+def huella_bytes(datos, bloques=BLOQUES_MUESTRA, tamano_bloque=TAMANO_BLOQUE):
+    """Combina el tamaño con el hash de unos pocos bloques; no depende del tamaño total."""
+    datos = memoryview(datos).cast('B')
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(len(datos)).encode())
+    posiciones = _posiciones_muestra(len(datos), bloques, tamano_bloque)
+    if len(datos) <= bloques * tamano_bloque:
+        h.update(datos)
+    else:
+        for posicion in posiciones:
+            h.update(datos[posicion:posicion + tamano_bloque])
+    return h.hexdigest()
+
+
+# Huella rápida de un archivo en disco: tamaño, fecha de modificación y bloques muestreados
+def huella_archivo(ruta, bloques=BLOQUES_MUESTRA, tamano_bloque=TAMANO_BLOQUE):
+    """Cambia cuando el archivo se edita, aunque conserve el mismo nombre."""
+    info = os.stat(ruta)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{info.st_size}:{info.st_mtime_ns}".encode())
+    with open(ruta, 'rb') as f:
+        if info.st_size <= bloques * tamano_bloque:
+            h.update(f.read())
+        else:
+            for posicion in _posiciones_muestra(info.st_size, bloques, tamano_bloque):
+                f.seek(posicion)
+                h.update(f.read(tamano_bloque))
+    return h.hexdigest()
+
+
+# Huella rápida de una ruta o de un archivo subido (objeto con `getbuffer()`)
+def huella_fuente(fuente):
+    if isinstance(fuente, (str, os.PathLike)):
+        return huella_archivo(fuente)
+    return huella_bytes(fuente.getbuffer())
+
+
+# Hash de todo el contenido, pensado para ejecutarse en segundo plano
+def hash_completo(fuente, tamano_bloque=1024 * 1024):
+    """`fuente` puede ser la ruta de un archivo o un buffer en memoria."""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(fuente, (str, os.PathLike)):
+        with open(fuente, 'rb') as f:
+            for bloque in iter(lambda: f.read(tamano_bloque), b''):
+                h.update(bloque)
+    else:
+        datos = memoryview(fuente).cast('B')
+        for inicio in range(0, len(datos), tamano_bloque):
+            h.update(datos[inicio:inicio + tamano_bloque])
+    return h.hexdigest()
+
+
+class RegistroHuellas:
+    """Hashes completos calculados en segundo plano, por fuente y huella rápida.
+
+    La fuente se identifica con su ruta o con el `file_id` del archivo subido,
+    así que un mismo contenido subido dos veces o una ruta editada se
+    verifican por separado. La app compara el resultado con el hash de los
+    datos cargados y solo cambia de clave si no coinciden.
+    """
+
+    def __init__(self, pool, max_registros=MAX_REGISTROS):
+        self._pool = pool
+        self.max_registros = max_registros
+        self._lock = threading.Lock()
+        self._futuros = OrderedDict()
+
+    # Lanza el hash completo de `fuente` una sola vez por (identidad, huella rápida)
+    def verificar(self, identidad, rapida, fuente):
+        clave = (identidad, rapida)
+        with self._lock:
+            futuro = self._futuros.get(clave)
+            if futuro is None or futuro.cancelled() or (futuro.done() and futuro.exception() is not None):
+                futuro = self._pool.submit(hash_completo, fuente)
+                self._futuros[clave] = futuro
+            self._futuros.move_to_end(clave)
+            while len(self._futuros) > self.max_registros:
+                self._futuros.popitem(last=False)
+            return futuro
+
+    # Hash completo ya calculado, o None si aún no terminó o no se pidió
+    def completo(self, identidad, rapida):
+        with self._lock:
+            futuro = self._futuros.get((identidad, rapida))
+        if futuro is None or not futuro.done() or futuro.cancelled() or futuro.exception() is not None:
+            return None
+        return futuro.result()
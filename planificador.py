@@ -0,0 +1,48 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Función para crear el pool compartido por todas las sesiones
+def crear_pool(max_workers=None):
+    max_workers = max_workers or min(4, os.cpu_count() or 1)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calculos")
+
+
+class PlanificadorCalculos:
+    """Lanza cálculos pesados en segundo plano para un estado de filtros.
+
+    Todas las tareas pertenecen a una generación identificada por `clave`.
+    Cuando la clave cambia (nuevo archivo o nuevos filtros) las tareas de la
+    generación anterior se cancelan y sus resultados se descartan.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._clave = None
+        self._tareas = {}
+
+    # Cambia de generación si la clave es distinta; devuelve True si hubo cambio
+    def actualizar(self, clave):
+        with self._lock:
+            if clave == self._clave:
+                return False
+            for futuro in self._tareas.values():
+                futuro.cancel()
+            self._clave = clave
+            self._tareas = {}
+            return True
+
+    # Envía la tarea solo si no existe ya en la generación actual
+    def enviar(self, nombre, funcion, *args, **kwargs):
+        with self._lock:
+            futuro = self._tareas.get(nombre)
+            if futuro is None or futuro.cancelled():
+                futuro = self._pool.submit(funcion, *args, **kwargs)
+                self._tareas[nombre] = futuro
+            return futuro
+
+    def tarea(self, nombre):
+        with self._lock:
+            return self._tareas.get(nombre)
@@ -0,0 +1,250 @@
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Cadencia nominal del registrador (segundos)
+PERIODO_MUESTREO_S = 30
+
+# Directorio donde se guardan las rejillas en formato .npy
+DIRECTORIO_REJILLAS = os.path.join(".cache", "rejilla")
+
+# Rejillas que se conservan en disco; al guardar una nueva se borran las usadas hace más tiempo
+MAX_REJILLAS = 8
+
+# Arrays que componen una rejilla en disco
+_CAMPOS = ('temperatura', 'presion', 'estado', 'valido', 'repetidos')
+
+# Versión del formato en disco; forma parte del nombre del directorio
+_VERSION = 2
+
+
+@dataclass
+class RejillaTemporal:
+    """Mediciones sobre una rejilla regular de `periodo_s` segundos.
+
+    La posición `i` de cada array corresponde al instante `t0 + i * periodo_s`.
+    `valido[i]` es False cuando no hubo medición en esa posición; `estado[i]`
+    vale -1 cuando el estado del compresor no se registró y `repetidos[i]`
+    cuenta las filas descartadas por caer en la misma posición.
+    """
+    t0: pd.Timestamp
+    periodo_s: int
+    temperatura: np.ndarray
+    presion: np.ndarray
+    estado: np.ndarray
+    valido: np.ndarray
+    repetidos: np.ndarray
+    duplicados: int = 0
+    desalineados: int = 0
+
+    def __len__(self):
+        return len(self.valido)
+
+    # Índice de la rejilla para un instante: aritmética O(1), sin búsqueda
+    def indice(self, instante):
+        delta = pd.Timestamp(instante) - self.t0
+        return int(np.floor(delta.total_seconds() / self.periodo_s))
+
+    def instante(self, indice):
+        return self.t0 + pd.Timedelta(seconds=int(indice) * self.periodo_s)
+
+    # Rango de índices cuyos instantes caen en [inicio, fin), recortado a la rejilla
+    def rango(self, inicio, fin):
+        i0 = min(max(self.indice(inicio - pd.Timedelta(1)) + 1, 0), len(self))
+        i1 = min(max(self.indice(fin - pd.Timedelta(1)) + 1, 0), len(self))
+        return i0, max(i0, i1)
+
+    # Rango de fechas y, opcionalmente, máscara de un código de estado dentro del rango
+    def seleccion(self, inicio, fin, codigo_estado=None):
+        i0, i1 = self.rango(inicio, fin)
+        mascara = None
+        if codigo_estado is not None:
+            mascara = np.asarray(self.estado[i0:i1]) == codigo_estado
+        return i0, i1, mascara
+
+    def duplicados_en(self, i0=0, i1=None):
+        return int(np.asarray(self.repetidos[i0:i1]).sum())
+
+    def tiempos(self, i0=0, i1=None):
+        i1 = len(self) if i1 is None else i1
+        return pd.date_range(self.instante(i0), periods=max(i1 - i0, 0), freq=f"{self.periodo_s}s")
+
+    # Serie con NaN en las posiciones sin medición, para que los gráficos no unan huecos
+    def serie(self, campo, i0=0, i1=None, mascara=None):
+        i1 = len(self) if i1 is None else i1
+        valores = np.asarray(getattr(self, campo)[i0:i1], dtype=float)
+        validos = np.asarray(self.valido[i0:i1])
+        if mascara is not None:
+            validos = validos & mascara
+        return np.where(validos, valores, np.nan)
+
+
+# Función para llevar un DataFrame cargado a una rejilla regular
+def construir_rejilla(df, periodo_s=PERIODO_MUESTREO_S):
+    """Ajusta las marcas de tiempo a la cadencia y coloca cada fila en su posición.
+
+    La rejilla toma la fase del propio registrador (mediana de las marcas
+    respecto a la primera), así que una cadencia en :15/:45 no se confunde con
+    huecos y duplicados. Las filas sin temperatura ni presión cuentan como
+    posiciones sin medición. Si dos filas con medición caen en la misma
+    posición se conserva la primera y se cuenta como duplicado.
+
+    >>> t = pd.date_range('2025-01-01 00:00:15', periods=100, freq='30s')
+    >>> r = construir_rejilla(pd.DataFrame({
+    ...     'fecha_hora': t, 'temperatura': 90.0, 'presion': 5.0, 'estado_compresor': '1'}))
+    >>> len(r), r.duplicados, r.desalineados, len(detectar_huecos(r))
+    (100, 0, 0, 0)
+    """
+    ns_todas = df['fecha_hora'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    df = df[df['temperatura'].notna() | df['presion'].notna()]
+    ns = df['fecha_hora'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    periodo_ns = np.int64(periodo_s) * 1_000_000_000
+
+    # Fase del registrador: desplazamiento mediano respecto a la primera marca,
+    # llevado a [-periodo/2, periodo/2) para que no salte entre 0 y periodo
+    primera = ns_todas.min()
+    fases = (ns_todas - primera + periodo_ns // 2) % periodo_ns - periodo_ns // 2
+    fase = np.int64(np.median(fases))
+    inicio = primera + fase
+
+    # Redondeo a la posición más cercana (floor(x + 1/2), sin empates al par). Si la
+    # fase es -periodo/2 la primera fila es un empate: se redondea hacia abajo para
+    # que caiga en la posición 0 y no deje un hueco falso al principio
+    mitad = periodo_ns // 2 - (1 if fase == -(periodo_ns // 2) else 0)
+    posiciones = (ns - inicio + mitad) // periodo_ns
+    desalineados = int(np.count_nonzero((ns - inicio) % periodo_ns))
+
+    n = int((ns_todas.max() - inicio + mitad) // periodo_ns) + 1
+    _, primeras, conteos = np.unique(posiciones, return_index=True, return_counts=True)
+    duplicados = len(posiciones) - len(primeras)
+    destino = posiciones[primeras]
+
+    temperatura = np.full(n, np.nan, dtype=np.float64)
+    presion = np.full(n, np.nan, dtype=np.float64)
+    estado = np.full(n, -1, dtype=np.int8)
+    valido = np.zeros(n, dtype=bool)
+    repetidos = np.zeros(n, dtype=np.int32)
+
+    temperatura[destino] = df['temperatura'].to_numpy(dtype=np.float64)[primeras]
+    presion[destino] = df['presion'].to_numpy(dtype=np.float64)[primeras]
+    estados = pd.to_numeric(df['estado_compresor'], errors='coerce').fillna(-1)
+    estado[destino] = estados.to_numpy()[primeras].astype(np.int8)
+    valido[destino] = True
+    repetidos[destino] = conteos - 1
+
+    return RejillaTemporal(
+        t0=pd.Timestamp(inicio),
+        periodo_s=periodo_s,
+        temperatura=temperatura,
+        presion=presion,
+        estado=estado,
+        valido=valido,
+        repetidos=repetidos,
+        duplicados=duplicados,
+        desalineados=desalineados,
+    )
+
+
+# Función para listar los tramos consecutivos sin medición
+def detectar_huecos(rejilla, i0=0, i1=None):
+    """Devuelve un DataFrame con inicio, fin, duración y muestras faltantes de cada hueco."""
+    i1 = len(rejilla) if i1 is None else i1
+    faltantes = ~np.asarray(rejilla.valido[i0:i1])
+
+    # Bordes de cada tramo de True en `faltantes`
+    bordes = np.diff(np.concatenate(([False], faltantes, [False])).astype(np.int8))
+    inicios = np.flatnonzero(bordes == 1) + i0
+    fines = np.flatnonzero(bordes == -1) + i0
+
+    huecos = pd.DataFrame({
+        'inicio': [rejilla.instante(i) for i in inicios],
+        'fin': [rejilla.instante(i) for i in fines],
+        'muestras_faltantes': fines - inicios,
+    })
+    huecos['duracion'] = pd.to_timedelta(huecos['muestras_faltantes'] * rejilla.periodo_s, unit='s')
+    return huecos
+
+
+# Función para guardar la rejilla como arrays .npy contiguos
+def guardar_rejilla(rejilla, directorio):
+    """Escribe la rejilla en `directorio` de forma atómica (carpeta temporal + rename)."""
+    padre = os.path.dirname(os.path.abspath(directorio))
+    os.makedirs(padre, exist_ok=True)
+    temporal = tempfile.mkdtemp(dir=padre)
+    try:
+        for campo in _CAMPOS:
+            np.save(os.path.join(temporal, f"{campo}.npy"), np.ascontiguousarray(getattr(rejilla, campo)))
+        meta = {
+            't0': rejilla.t0.isoformat(),
+            'periodo_s': rejilla.periodo_s,
+            'duplicados': rejilla.duplicados,
+            'desalineados': rejilla.desalineados,
+        }
+        with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temporal, directorio)
+    except OSError:
+        # Otro proceso pudo haber escrito la misma rejilla primero
+        shutil.rmtree(temporal, ignore_errors=True)
+        if not os.path.isdir(directorio):
+            raise
+
+
+# Función para abrir una rejilla guardada como memoria mapeada (solo lectura)
+def cargar_rejilla(directorio, mmap_mode='r'):
+    with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    arrays = {
+        campo: np.load(os.path.join(directorio, f"{campo}.npy"), mmap_mode=mmap_mode)
+        for campo in _CAMPOS
+    }
+    return RejillaTemporal(
+        t0=pd.Timestamp(meta['t0']),
+        periodo_s=meta['periodo_s'],
+        duplicados=meta.get('duplicados', 0),
+        desalineados=meta.get('desalineados', 0),
+        **arrays,
+    )
+
+
+def _directorio_rejilla(clave, periodo_s, base):
+    return os.path.join(base, f"{clave}_{periodo_s}s_v{_VERSION}")
+
+
+# Borra las rejillas guardadas menos usadas recientemente hasta dejar `conservar`
+def limpiar_rejillas(base=DIRECTORIO_REJILLAS, conservar=MAX_REJILLAS):
+    """La fecha de modificación del directorio indica su último uso.
+
+    Las carpetas temporales de `guardar_rejilla` (prefijo `tmp`) se ignoran
+    porque pueden estar escribiéndose. Una rejilla borrada mientras otra
+    sesión la tiene mapeada sigue siendo legible en Linux y macOS; si el
+    sistema no permite borrarla, se deja para la próxima limpieza.
+    """
+    try:
+        entradas = [e for e in os.scandir(base) if e.is_dir() and not e.name.startswith('tmp')]
+    except FileNotFoundError:
+        return
+    entradas.sort(key=lambda e: e.stat().st_mtime_ns, reverse=True)
+    for entrada in entradas[conservar:]:
+        shutil.rmtree(entrada.path, ignore_errors=True)
+
+
+# Devuelve la rejilla del DataFrame, reutilizando la copia en disco si ya existe
+def obtener_rejilla(df, clave, periodo_s=PERIODO_MUESTREO_S, base=DIRECTORIO_REJILLAS):
+    directorio = _directorio_rejilla(clave, periodo_s, base)
+    try:
+        # Marcar como usada para que la limpieza la conserve
+        os.utime(directorio)
+        return cargar_rejilla(directorio)
+    except FileNotFoundError:
+        # No existe todavía, o la limpieza de otra sesión la borró (quizá a medias):
+        # se quitan los restos para que el rename de `guardar_rejilla` no falle
+        shutil.rmtree(directorio, ignore_errors=True)
+    guardar_rejilla(construir_rejilla(df, periodo_s), directorio)
+    limpiar_rejillas(base)
+    return cargar_rejilla(directorio)